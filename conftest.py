@@ -0,0 +1,49 @@
+"""
+Shared pytest fixtures for the Helix test scripts.
+
+Each script historically built its own HelixEngine, so a full test run
+paid the model load (disk I/O plus tensor allocation) once per file.
+The session-scoped fixture below loads the engine a single time and
+hands the same instance to every test that asks for it.
+
+test_model_load.py deliberately keeps its own from-scratch load: it is
+the one place where load time itself is the thing being measured.
+
+Tests that don't touch a model can run in parallel with pytest-xdist:
+
+    pytest -n auto --dist=loadfile -m "not serial"
+
+Model-loading tests are marked "serial" and should run in a second,
+single-worker pass - each xdist worker builds its own session fixture,
+so fanning them out multiplies the load instead of amortizing it.
+"""
+
+import os
+
+import pytest
+
+# Force CPU before any Helix import so device probing stays deterministic
+os.environ.setdefault("HELIX_FORCE_CPU", "1")
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "serial: loads models; keep off the xdist worker pool"
+    )
+
+
+def pytest_collection_modifyitems(items):
+    # Anything that pulls in the shared engine loads models
+    for item in items:
+        if "engine" in getattr(item, "fixturenames", ()):
+            item.add_marker(pytest.mark.serial)
+
+
+@pytest.fixture(scope="session")
+def engine():
+    """HelixEngine loaded once per test session (CPU mode)."""
+    from src.inference import HelixEngine
+
+    eng = HelixEngine()
+    eng.load()
+    yield eng
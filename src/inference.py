@@ -66,6 +66,60 @@ class GenerationResult:
     stats: Dict[str, Any] = field(default_factory=dict)
 
 
+def _validate_generate_inputs(
+    prompt: str,
+    config: Optional[GenerationConfig],
+) -> GenerationConfig:
+    """
+    Validate a prompt/config pair before any model is touched.
+
+    Shared by generate and generate_stream, and callable directly from
+    tests - bad input is rejected here without loading a model.
+
+    Returns:
+        The config to use (a default one if None was passed)
+
+    Raises:
+        ValueError: If prompt or config values are invalid
+    """
+    if not prompt or not prompt.strip():
+        raise ValueError("prompt cannot be empty or whitespace-only")
+
+    if config is None:
+        config = GenerationConfig()
+
+    if config.max_tokens and config.max_tokens < 1:
+        raise ValueError(f"max_tokens must be >= 1, got {config.max_tokens}")
+    if config.temperature < 0.0:
+        raise ValueError(f"temperature must be >= 0, got {config.temperature}")
+
+    return config
+
+
+def _validate_batch_inputs(prompts: List[str]) -> List[str]:
+    """
+    Validate a batch of prompts before any model is touched.
+
+    Returns:
+        The prompts that survived filtering (empty ones are dropped)
+
+    Raises:
+        ValueError: If the list is empty or every prompt is blank
+    """
+    if not prompts:
+        raise ValueError("prompts list cannot be empty")
+
+    # Filter out empty prompts and warn
+    valid_prompts = [p for p in prompts if p and p.strip()]
+    if len(valid_prompts) < len(prompts):
+        logger.warning(f"Filtered out {len(prompts) - len(valid_prompts)} empty prompts")
+
+    if not valid_prompts:
+        raise ValueError("All prompts are empty")
+
+    return valid_prompts
+
+
 class HelixEngine:
     """
     Main inference engine for Helix.
@@ -215,19 +269,9 @@ class HelixEngine:
         Raises:
             ValueError: If prompt is empty or invalid
         """
-        # Input validation
-        if not prompt or not prompt.strip():
-            raise ValueError("prompt cannot be empty or whitespace-only")
-        
-        if config is None:
-            config = GenerationConfig()
-        
-        # Validate config
-        if config.max_tokens and config.max_tokens < 1:
-            raise ValueError(f"max_tokens must be >= 1, got {config.max_tokens}")
-        if config.temperature < 0.0:
-            raise ValueError(f"temperature must be >= 0, got {config.temperature}")
-        
+        # Input validation (before any model load)
+        config = _validate_generate_inputs(prompt, config)
+
         # Error handling wrapper
         try:
             return self._generate_safe(prompt, config)
@@ -337,18 +381,9 @@ class HelixEngine:
         - All sequences in batch run at speed of slowest sequence
         - Optimal batch size depends on GPU memory and sequence length
         """
-        # Input validation
-        if not prompts:
-            raise ValueError("prompts list cannot be empty")
-        
-        # Filter out empty prompts and warn
-        valid_prompts = [p for p in prompts if p and p.strip()]
-        if len(valid_prompts) < len(prompts):
-            logger.warning(f"Filtered out {len(prompts) - len(valid_prompts)} empty prompts")
-        
-        if not valid_prompts:
-            raise ValueError("All prompts are empty")
-        
+        # Input validation (before any model load)
+        valid_prompts = _validate_batch_inputs(prompts)
+
         if config is None:
             config = GenerationConfig()
         
@@ -415,19 +450,9 @@ class HelixEngine:
             async for token in engine.generate_stream("Hello"):
                 logger.debug(token.token)
         """
-        # Input validation
-        if not prompt or not prompt.strip():
-            raise ValueError("prompt cannot be empty or whitespace-only")
-        
-        if config is None:
-            config = GenerationConfig()
-        
-        # Validate config
-        if config.max_tokens and config.max_tokens < 1:
-            raise ValueError(f"max_tokens must be >= 1, got {config.max_tokens}")
-        if config.temperature < 0.0:
-            raise ValueError(f"temperature must be >= 0, got {config.temperature}")
-        
+        # Input validation (before any model load)
+        config = _validate_generate_inputs(prompt, config)
+
         # Ensure model loaded
         self._ensure_loaded()
         
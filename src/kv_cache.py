@@ -20,7 +20,7 @@ Phase 4 Update: Full integration with HuggingFace models
 """
 
 import torch
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Dict, List, NamedTuple, Optional, Tuple, Any
 from dataclasses import dataclass, field
 import logging
 
@@ -130,6 +130,14 @@ class BlockAllocator:
         return 1.0 - (self.num_free_blocks / self.num_blocks)
 
 
+class CacheStats(NamedTuple):
+    """Lightweight snapshot of cache counters (no dict allocation)."""
+    num_sequences: int
+    utilization: float
+    free_blocks: int
+    total_blocks: int
+
+
 @dataclass
 class SequenceBlockTable:
     """
@@ -216,6 +224,19 @@ class PagedKVCache:
         
         return seq_id
     
+    def allocate_sequences(self, n: int) -> List[int]:
+        """Allocate n new sequences in one call. Returns their IDs.
+
+        Batched convenience over allocate_sequence for callers setting up
+        a whole batch at once (one dispatch instead of n).
+        """
+        return [self.allocate_sequence() for _ in range(n)]
+
+    def free_sequences(self, seq_ids: List[int]) -> None:
+        """Free a batch of sequences in one call."""
+        for seq_id in seq_ids:
+            self.free_sequence(seq_id)
+
     def free_sequence(self, seq_id: int) -> None:
         """Free all blocks associated with a sequence."""
         if seq_id not in self.sequences:
@@ -257,6 +278,52 @@ class PagedKVCache:
         k_storage[layer_idx, offset] = k.squeeze(0).squeeze(1)  # Remove batch and seq dims
         v_storage[layer_idx, offset] = v.squeeze(0).squeeze(1)
     
+    def append_tokens_kv(
+        self,
+        seq_id: int,
+        k: torch.Tensor,  # Shape: (num_layers, 1, num_heads, num_tokens, head_dim)
+        v: torch.Tensor,
+    ) -> None:
+        """
+        Append K and V for a run of tokens across all layers at once.
+
+        Equivalent to num_layers * num_tokens append_token_kv calls plus
+        the matching mark_token_complete calls, but issues one strided
+        slice copy per physical block instead of a Python-level write per
+        (layer, token) pair.
+        """
+        table = self.sequences[seq_id]
+        num_tokens = k.shape[3]
+
+        # Rearrange to (num_layers, num_tokens, num_heads, head_dim) to
+        # match the block storage layout
+        k_src = k.squeeze(1).permute(0, 2, 1, 3)
+        v_src = v.squeeze(1).permute(0, 2, 1, 3)
+
+        written = 0
+        while written < num_tokens:
+            # Allocate new block if needed
+            if table.needs_new_block() and table.num_tokens > 0:
+                block_id = self.allocator.allocate()
+                if block_id is None:
+                    raise RuntimeError("OOM: Cannot allocate new block")
+                table.add_block(block_id)
+
+            block_id, offset = table.get_physical_location(table.num_tokens)
+            k_storage, v_storage = self.allocator.get_kv_storage(block_id)
+
+            # Copy as many tokens as fit in this block in one slice write
+            take = min(self.block_size - offset, num_tokens - written)
+            k_storage[:, offset:offset + take] = (
+                k_src[:, written:written + take].to(k_storage.dtype)
+            )
+            v_storage[:, offset:offset + take] = (
+                v_src[:, written:written + take].to(v_storage.dtype)
+            )
+
+            table.num_tokens += take
+            written += take
+
     def get_kv(
         self,
         seq_id: int,
@@ -305,15 +372,24 @@ class PagedKVCache:
         """Mark that a token generation is complete (increment counter)."""
         self.sequences[seq_id].append_token()
     
+    def stats_view(self) -> CacheStats:
+        """Get cache statistics as a NamedTuple.
+
+        Cheaper than the ``stats`` dict for per-step polling: a C-backed
+        tuple instantiation with attribute access instead of a fresh dict
+        plus string-hash lookups.
+        """
+        return CacheStats(
+            num_sequences=len(self.sequences),
+            utilization=self.allocator.utilization,
+            free_blocks=self.allocator.num_free_blocks,
+            total_blocks=self.allocator.num_blocks,
+        )
+
     @property
     def stats(self) -> dict:
-        """Get cache statistics."""
-        return {
-            "num_sequences": len(self.sequences),
-            "utilization": self.allocator.utilization,
-            "free_blocks": self.allocator.num_free_blocks,
-            "total_blocks": self.allocator.num_blocks,
-        }
+        """Get cache statistics as a dict (kept for back-compat)."""
+        return self.stats_view()._asdict()
     
     def store_hf_cache(
         self,
@@ -324,22 +400,31 @@ class PagedKVCache:
         """
         Store HuggingFace past_key_values into PagedKVCache.
         
-        Supports both formats:
+        Supports three formats:
         - Legacy tuple format: Tuple of (key, value) for each layer
         - DynamicCache format: Cache object with to_legacy_cache() method
-        
+        - Stacked tensor: (2, num_layers, batch, heads, seq_len, head_dim),
+          index 0 = keys, index 1 = values (one contiguous allocation
+          instead of a tuple-of-tuples of small tensors)
+
         key/value shape: (batch_size, num_heads, seq_len, head_dim)
-        
+
         Args:
             seq_id: Sequence ID to store cache for
-            past_key_values: HuggingFace format cache (tuple or DynamicCache)
+            past_key_values: HuggingFace format cache (tuple, DynamicCache,
+                or stacked tensor)
             start_pos: Starting position (for incremental storage)
         """
         if past_key_values is None:
             return
-        
+
         table = self.sequences[seq_id]
-        
+
+        # Handle stacked-tensor format: unbind produces views, no copies
+        if isinstance(past_key_values, torch.Tensor):
+            keys, values = past_key_values[0], past_key_values[1]
+            past_key_values = tuple(zip(keys.unbind(0), values.unbind(0)))
+
         # Handle DynamicCache format (transformers >= 4.36)
         # Check for to_legacy_cache method (most reliable way to detect DynamicCache)
         if hasattr(past_key_values, 'to_legacy_cache'):
@@ -490,6 +575,18 @@ class PagedKVCache:
         table = self.sequences.get(seq_id)
         return table.num_tokens if table else 0
 
+    def get_cached_lengths(self, seq_ids: List[int]) -> List[int]:
+        """Get cached token counts for several sequences in one call.
+
+        One dispatch for a whole batch of sequences rather than a poll
+        per sequence per step.
+        """
+        lengths = []
+        for seq_id in seq_ids:
+            table = self.sequences.get(seq_id)
+            lengths.append(table.num_tokens if table else 0)
+        return lengths
+
 
 class CachedModelWrapper:
     """
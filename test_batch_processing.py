@@ -4,37 +4,87 @@ Batch Processing Test and Benchmark
 Tests Phase 4 batch processing implementation and measures throughput improvements.
 """
 
-import urllib.request
+import http.client
 import json
+import threading
 import time
 import sys
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# orjson serializes small dicts several times faster than stdlib json and
+# returns bytes directly (no separate encode/decode copy); fall back to
+# stdlib if it isn't installed since it's not a hard dependency
+try:
+    import orjson
+
+    def _dumps(obj):
+        return orjson.dumps(obj)
+
+    def _loads(data):
+        return orjson.loads(data)
+except ImportError:
+    def _dumps(obj):
+        return json.dumps(obj).encode('utf-8')
+
+    def _loads(data):
+        return json.loads(data.decode('utf-8'))
+
+HOST = "127.0.0.1"
+PORT = 8000
+
+# One persistent keep-alive connection per thread: a fresh TCP handshake
+# per request is a visible share of a ~30-token generation and pollutes
+# the throughput numbers
+_local = threading.local()
+
+
+class HTTPStatusError(Exception):
+    """Non-2xx response from the server."""
+
+    def __init__(self, status, reason):
+        super().__init__(f"HTTP {status}: {reason}")
+        self.code = status
+
+
+def post_json(path, payload):
+    """POST a JSON payload over this thread's persistent connection."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = http.client.HTTPConnection(HOST, PORT, timeout=120)
+        _local.conn = conn
+    body = _dumps(payload)
+    try:
+        conn.request("POST", path, body=body,
+                     headers={'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        data = response.read()
+    except (http.client.HTTPException, ConnectionError):
+        # Stale keep-alive socket: drop it so the next call reconnects
+        conn.close()
+        _local.conn = None
+        raise
+    if response.status >= 400:
+        raise HTTPStatusError(response.status, response.reason)
+    return _loads(data)
 
 def test_single_generation():
     """Baseline: Single generation request."""
-    url = "http://127.0.0.1:8000/generate"
     payload = {
         "prompt": "What is artificial intelligence?",
         "max_tokens": 30,
         "temperature": 0.7
     }
-    
+
     print("=" * 70)
     print("TEST 1: Single Generation (Baseline)")
     print("=" * 70)
-    
+
     try:
-        data = json.dumps(payload).encode('utf-8')
-        req = urllib.request.Request(
-            url,
-            data=data,
-            headers={'Content-Type': 'application/json'}
-        )
-        
-        start = time.time()
-        with urllib.request.urlopen(req) as response:
-            result = json.loads(response.read().decode('utf-8'))
-            end = time.time()
-        
+        start = time.perf_counter()
+        result = post_json("/generate", payload)
+        end = time.perf_counter()
+
         print(f"✅ Single request completed")
         print(f"   Tokens: {result['tokens_generated']}")
         print(f"   Time: {end - start:.3f}s")
@@ -46,107 +96,179 @@ def test_single_generation():
         return None
 
 
-def test_sequential_batch(n=3):
-    """Test N sequential single requests."""
-    url = "http://127.0.0.1:8000/generate"
+def test_streaming_ttft(max_tokens=30):
+    """Measure TTFT and TPOT from the SSE stream.
+
+    The buffered /generate call returns only after the last token, so any
+    client-side "first token" number derived from it is really
+    time-to-last-token. Reading /generate/stream line by line and
+    timestamping the first and last data events gives honest
+    time-to-first-token and time-per-output-token figures.
+    """
+    payload = {
+        "prompt": "What is artificial intelligence?",
+        "max_tokens": max_tokens,
+        "temperature": 0.7
+    }
+
+    print("\n" + "=" * 70)
+    print("TEST 1b: Streaming TTFT/TPOT")
+    print("=" * 70)
+
+    # A dedicated connection: the stream is read incrementally, which
+    # doesn't fit post_json's read-everything contract
+    conn = http.client.HTTPConnection(HOST, PORT, timeout=120)
+    try:
+        start = time.perf_counter()
+        conn.request("POST", "/generate/stream", body=_dumps(payload),
+                     headers={'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        if response.status >= 400:
+            raise HTTPStatusError(response.status, response.reason)
+
+        first = last = None
+        tokens = 0
+        for line in response:
+            if not line.startswith(b"data:"):
+                continue
+            now = time.perf_counter()
+            if first is None:
+                first = now
+            last = now
+            tokens += 1
+
+        if first is None:
+            print("❌ Stream produced no data events")
+            return None
+
+        ttft = first - start
+        tpot = (last - first) / max(tokens - 1, 1)
+        print(f"✅ Streamed {tokens} events")
+        print(f"   TTFT: {ttft:.3f}s")
+        print(f"   TPOT: {tpot*1000:.1f} ms/token")
+        print(f"   TTLT: {last - start:.3f}s")
+        return ttft
+
+    except HTTPStatusError as e:
+        if e.code == 404:
+            print("⚠️  Streaming endpoint not found - skipping")
+        else:
+            print(f"❌ HTTP error: {e}")
+        return None
+    except Exception as e:
+        print(f"❌ Failed: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+def test_concurrent_requests(n=3):
+    """Test N single requests fired concurrently.
+
+    Issuing the requests back-to-back from one thread serializes them on
+    the client side, so the server never sees more than one in flight and
+    the comparison against /generate/batch is misleading. Firing them all
+    at once lets server-side batching actually coalesce the work; the
+    number that matters is aggregate throughput over the whole wall-clock.
+    """
     prompts = [
         "What is machine learning?",
         "Explain neural networks.",
         "What is deep learning?"
     ]
-    
+
     print("\n" + "=" * 70)
-    print(f"TEST 2: Sequential {n} Requests")
+    print(f"TEST 2: Concurrent {n} Requests")
     print("=" * 70)
-    
-    start = time.time()
-    results = []
-    
-    for i, prompt in enumerate(prompts[:n]):
+
+    def post(prompt):
         payload = {
             "prompt": prompt,
             "max_tokens": 30,
             "temperature": 0.7
         }
-        
-        try:
-            data = json.dumps(payload).encode('utf-8')
-            req = urllib.request.Request(
-                url,
-                data=data,
-                headers={'Content-Type': 'application/json'}
-            )
-            
-            with urllib.request.urlopen(req) as response:
-                result = json.loads(response.read().decode('utf-8'))
+        return post_json("/generate", payload)
+
+    start = time.perf_counter()
+    results = []
+
+    with ThreadPoolExecutor(max_workers=n) as pool:
+        futures = [pool.submit(post, p) for p in prompts[:n]]
+        for i, future in enumerate(futures):
+            try:
+                result = future.result()
                 results.append(result)
                 print(f"   Request {i+1}/{n}: {result['tokens_generated']} tokens")
-        
-        except Exception as e:
-            print(f"   ❌ Request {i+1} failed: {e}")
-    
-    end = time.time()
+            except Exception as e:
+                print(f"   ❌ Request {i+1} failed: {e}")
+
+    end = time.perf_counter()
     total_time = end - start
-    
+
     if results:
         total_tokens = sum(r['tokens_generated'] for r in results)
-        print(f"\n✅ Sequential batch completed")
+        print(f"\n✅ Concurrent requests completed")
         print(f"   Total time: {total_time:.3f}s")
         print(f"   Avg time per request: {total_time/len(results):.3f}s")
         print(f"   Total tokens: {total_tokens}")
-        print(f"   Throughput: {total_tokens/total_time:.2f} tok/s")
-    
+        print(f"   Aggregate throughput: {total_tokens/total_time:.2f} tok/s")
+
     return total_time
 
 
 def test_batch_endpoint(n=3):
     """Test new batch endpoint."""
-    url = "http://127.0.0.1:8000/generate/batch"
     prompts = [
         "What is machine learning?",
         "Explain neural networks.",
         "What is deep learning?"
     ]
-    
+
     print("\n" + "=" * 70)
     print(f"TEST 3: Batch Endpoint ({n} prompts)")
     print("=" * 70)
-    
+
+    # Dispatch longest-first: a padded batch is bounded by its longest
+    # sequence, so mixing short and long prompts wastes prefill compute on
+    # padding. Character count is a good-enough proxy for token count.
+    # Responses come back in dispatch order, so remember the permutation
+    # to restore the caller's ordering.
+    prompts = prompts[:n]
+    order = sorted(range(len(prompts)), key=lambda i: -len(prompts[i]))
     payload = {
-        "prompts": prompts[:n],
+        "prompts": [prompts[i] for i in order],
         "max_tokens": 30,
         "temperature": 0.7
     }
-    
+
     try:
-        data = json.dumps(payload).encode('utf-8')
-        req = urllib.request.Request(
-            url,
-            data=data,
-            headers={'Content-Type': 'application/json'}
-        )
-        
-        start = time.time()
-        with urllib.request.urlopen(req) as response:
-            result = json.loads(response.read().decode('utf-8'))
-            end = time.time()
-        
+        result = post_json("/generate/batch", payload)
+
         total_time = result['total_time_seconds']
         avg_time = result['avg_time_per_prompt']
-        total_tokens = sum(r['tokens_generated'] for r in result['results'])
-        
+
+        # One pass over the results: accumulate the token total and undo
+        # the length sort so entries line up with the original prompts
+        total_tokens = 0
+        by_original = [None] * len(order)
+        for pos, r in enumerate(result['results']):
+            total_tokens += r['tokens_generated']
+            if pos < len(order):
+                by_original[order[pos]] = r
+
         print(f"✅ Batch request completed")
         print(f"   Total time: {total_time:.3f}s")
         print(f"   Avg time per prompt: {avg_time:.3f}s")
         print(f"   Total tokens: {total_tokens}")
         print(f"   Throughput: {total_tokens/total_time:.2f} tok/s")
         print(f"\n   Results:")
-        for i, r in enumerate(result['results'][:3]):  # Show first 3
-            print(f"     {i+1}. {r['tokens_generated']} tokens in {r['time_seconds']:.3f}s")
-        
+        for i, r in enumerate(by_original[:3]):  # Show first 3
+            if r is not None:
+                print(f"     {i+1}. {r['tokens_generated']} tokens in {r['time_seconds']:.3f}s")
+
         return total_time
         
-    except urllib.request.HTTPError as e:
+    except HTTPStatusError as e:
         if e.code == 404:
             print(f"⚠️  Batch endpoint not found (expected if not implemented yet)")
             print(f"   This is normal - batch endpoint is part of Phase 4")
@@ -158,16 +280,78 @@ def test_batch_endpoint(n=3):
         return None
 
 
-def calculate_improvement(sequential_time, batch_time):
+def sweep_concurrency(levels=(1, 2, 4, 8), requests_per_level=8):
+    """Closed-loop concurrency sweep to find the server's throughput knee.
+
+    A single hard-coded n can't tell whether the server is underloaded or
+    saturated. Driving it at increasing concurrency and watching aggregate
+    tokens/sec against tail latency shows where throughput stops scaling -
+    the right operating point for batching knobs.
+    """
+    prompt = "Explain how speculative decoding speeds up inference."
+    payload = {"prompt": prompt, "max_tokens": 30, "temperature": 0.7}
+
+    print("\n" + "=" * 70)
+    print("TEST 4: Concurrency Sweep")
+    print("=" * 70)
+
+    def post_one(_):
+        t0 = time.perf_counter()
+        result = post_json("/generate", payload)
+        return time.perf_counter() - t0, result['tokens_generated']
+
+    rows = []
+    for cc in levels:
+        try:
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=cc) as pool:
+                outcomes = list(pool.map(post_one, range(requests_per_level)))
+            wall = time.perf_counter() - start
+        except Exception as e:
+            print(f"   ❌ Concurrency {cc} failed: {e}")
+            continue
+
+        latencies = sorted(o[0] for o in outcomes)
+        tokens = sum(o[1] for o in outcomes)
+        p50 = latencies[len(latencies) // 2]
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        rows.append({
+            "concurrency": cc,
+            "throughput_tok_s": tokens / wall,
+            "p50_s": p50,
+            "p99_s": p99,
+        })
+        print(f"   concurrency={cc}: {tokens/wall:.2f} tok/s  "
+              f"p50={p50:.3f}s  p99={p99:.3f}s")
+
+    if rows:
+        best = max(rows, key=lambda r: r["throughput_tok_s"])
+        print(f"\n   | concurrency | tok/s | p50 (s) | p99 (s) |")
+        print(f"   |-------------|-------|---------|---------|")
+        for r in rows:
+            print(f"   | {r['concurrency']:>11} | {r['throughput_tok_s']:>5.1f} "
+                  f"| {r['p50_s']:>7.3f} | {r['p99_s']:>7.3f} |")
+        print(f"\n   Best: concurrency={best['concurrency']} "
+              f"at {best['throughput_tok_s']:.2f} tok/s")
+
+        # JSON artifact so CI runs can diff sweeps over time
+        with open("batch_sweep_results.json", "w") as f:
+            json.dump(rows, f, indent=2)
+        print("   Saved: batch_sweep_results.json")
+
+    return rows
+
+
+def calculate_improvement(concurrent_time, batch_time):
     """Calculate throughput improvement."""
-    if sequential_time and batch_time:
-        improvement = ((sequential_time - batch_time) / sequential_time) * 100
-        speedup = sequential_time / batch_time
-        
+    if concurrent_time and batch_time:
+        improvement = ((concurrent_time - batch_time) / concurrent_time) * 100
+        speedup = concurrent_time / batch_time
+
         print("\n" + "=" * 70)
         print("PERFORMANCE IMPROVEMENT")
         print("=" * 70)
-        print(f"Sequential time: {sequential_time:.3f}s")
+        print(f"Concurrent time: {concurrent_time:.3f}s")
         print(f"Batch time:      {batch_time:.3f}s")
         print(f"Improvement:     {improvement:.1f}%")
         print(f"Speedup:         {speedup:.2f}x")
@@ -188,23 +372,44 @@ def main():
     print("Phase 4: Batch Processing Validation")
     print("=" * 70)
     
-    # Check server
-    try:
-        with urllib.request.urlopen("http://127.0.0.1:8000/docs") as response:
-            print(f"✅ Server is running\n")
-    except Exception as e:
-        print(f"❌ Server not running: {e}")
+    # Poll for readiness with backoff instead of a single probe: loading
+    # GPT-2 Medium can take tens of seconds on CPU, and a one-shot check
+    # fails spuriously against a server that is still starting up
+    ready = False
+    for delay in (0.1, 0.2, 0.5, 1, 2, 5):
+        try:
+            with urllib.request.urlopen(f"http://{HOST}:{PORT}/docs", timeout=2):
+                ready = True
+                break
+        except Exception:
+            time.sleep(delay)
+    if ready:
+        print(f"✅ Server is running\n")
+    else:
+        print(f"❌ Server not responding after ~{0.1+0.2+0.5+1+2+5:.0f}s of retries")
         print("\nStart the server with: python run.py")
         sys.exit(1)
-    
+
+    # Warm up: primes the keep-alive connection and the server's first-call
+    # paths so they don't land inside the timed sections
+    try:
+        post_json("/generate", {"prompt": "warmup", "max_tokens": 1, "temperature": 0.7})
+    except Exception:
+        pass
+
     # Run tests
     single_time = test_single_generation()
-    sequential_time = test_sequential_batch(3)
+    test_streaming_ttft()
+    concurrent_time = test_concurrent_requests(3)
     batch_time = test_batch_endpoint(3)
-    
+
+    # Optional: longer closed-loop sweep to locate the throughput knee
+    if "--sweep" in sys.argv:
+        sweep_concurrency()
+
     # Calculate improvement
-    if sequential_time and batch_time:
-        calculate_improvement(sequential_time, batch_time)
+    if concurrent_time and batch_time:
+        calculate_improvement(concurrent_time, batch_time)
     elif batch_time is None:
         print("\n" + "=" * 70)
         print("NOTE: Batch endpoint test skipped")
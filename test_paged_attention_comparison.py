@@ -10,9 +10,17 @@ Usage:
 """
 
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import sys
 
+# One keep-alive session over a single pinned socket: the three tests
+# share a TCP connection instead of paying a handshake each. Module
+# level (not a parameter) so pytest can still collect the tests without
+# hunting for a "session" fixture.
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+
 
 def test_memory_comparison_endpoint():
     """Test the /compare/memory endpoint."""
@@ -24,7 +32,7 @@ def test_memory_comparison_endpoint():
     
     try:
         print(f"\n📡 Sending GET request to {url}...")
-        response = requests.get(url, timeout=10)
+        response = SESSION.get(url, timeout=10)
         
         print(f"✓ Status Code: {response.status_code}")
         
@@ -94,7 +102,7 @@ def test_api_documentation():
     
     try:
         # Test OpenAPI schema
-        response = requests.get("http://localhost:8000/openapi.json", timeout=5)
+        response = SESSION.get("http://localhost:8000/openapi.json", timeout=5)
         if response.status_code == 200:
             schema = response.json()
             if "/compare/memory" in schema.get("paths", {}):
@@ -120,7 +128,7 @@ def test_cors():
     print("=" * 60)
     
     try:
-        response = requests.get(
+        response = SESSION.get(
             "http://localhost:8000/compare/memory",
             headers={"Origin": "http://localhost:5173"},  # Frontend origin
             timeout=5
@@ -141,7 +149,7 @@ def test_cors():
 def main():
     """Run all tests."""
     print("\n🧪 PagedAttention Comparison Feature Test Suite\n")
-    
+
     results = {
         "Memory Comparison Endpoint": test_memory_comparison_endpoint(),
         "API Documentation": test_api_documentation(),
@@ -174,4 +182,7 @@ def main():
 
 
 if __name__ == "__main__":
-    sys.exit(main())
+    try:
+        sys.exit(main())
+    finally:
+        SESSION.close()
@@ -5,17 +5,38 @@ This test validates that all modified files can be parsed without syntax errors.
 It doesn't run the actual inference (which requires torch), just validates code structure.
 """
 
-import ast
+import hashlib
+import os
 import sys
 from pathlib import Path
 
+# Stamp files recording that a given (path, mtime, size) already passed;
+# warm runs then skip re-parsing unchanged files entirely
+CACHE_DIR = Path(".cache/syntax")
+
+
+def _stamp_path(filepath, st):
+    key = f"{filepath}:{st.st_mtime_ns}:{st.st_size}"
+    return CACHE_DIR / (hashlib.sha1(key.encode()).hexdigest() + ".ok")
+
+
 def validate_python_file(filepath):
     """Check if a Python file has valid syntax."""
     print(f"Validating {filepath}...")
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            code = f.read()
-        ast.parse(code)
+        st = os.stat(filepath)
+        stamp = _stamp_path(filepath, st)
+        if stamp.exists():
+            print(f"  ✓ {filepath} - Valid syntax (cached)")
+            return True
+        # Hand compile() the raw bytes: the tokenizer decodes per the PEP 263
+        # coding line itself, skipping the up-front whole-file str decode.
+        # compile() reports the same SyntaxErrors as ast.parse without
+        # materializing an AST.
+        data = Path(filepath).read_bytes()
+        compile(data, filepath, 'exec', dont_inherit=True)
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        stamp.touch()
         print(f"  ✓ {filepath} - Valid syntax")
         return True
     except SyntaxError as e:
@@ -9,11 +9,18 @@ Runs all critical checks before submitting to judges:
 5. Benchmark script verification
 """
 
+import argparse
 import subprocess
 import sys
 import os
 import time
 import requests
+from requests.adapters import HTTPAdapter
+
+# The interpreter running this validator; a hardcoded ven\Scripts path
+# only exists on the original Windows setup and every spawn attempt
+# elsewhere burned a fork/exec plus an exception before failing
+PY = sys.executable
 
 GREEN = '\033[92m'
 RED = '\033[91m'
@@ -28,7 +35,76 @@ def check(name, passed, details=""):
         print(f"  {YELLOW}{details}{RESET}")
     return passed
 
+def _server_startup_ok():
+    """Start the API server (or reuse one already on :8000) and wait for
+    /ping. Returns (ok, details) for check()."""
+    # A dev server that's already listening answers immediately - no
+    # point paying a second model load to prove startup works
+    try:
+        if requests.get("http://localhost:8000/ping", timeout=0.5).status_code == 200:
+            print("  (reusing server already listening on :8000)")
+            return True, ""
+    except requests.RequestException:
+        pass
+
+    server_proc = None
+    try:
+        # Output goes to DEVNULL: nothing ever read the PIPEs, so a
+        # chatty server could fill them and deadlock against wait()
+        server_proc = subprocess.Popen(
+            [PY, "run.py"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+        # Poll /ping until the server is up instead of a flat 15s sleep:
+        # a fast model load stops waiting immediately, a slow one gets up
+        # to ~60s where the single post-sleep request used to flake. The
+        # session keeps one pooled connection across retries.
+        session = requests.Session()
+        session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        started = time.perf_counter()
+        ready = False
+        for i in range(60):
+            try:
+                response = session.get("http://localhost:8000/ping", timeout=0.5)
+                if response.status_code == 200:
+                    ready = True
+                    break
+            except requests.RequestException:
+                pass
+            time.sleep(min(0.25 * 2 ** (i // 4), 2.0))
+        startup_s = time.perf_counter() - started
+        session.close()
+
+        if ready:
+            print(f"  (server ready in {startup_s:.1f}s)")
+            return True, ""
+        return False, f"No /ping response after {startup_s:.0f}s"
+    except Exception as e:
+        return False, str(e)
+    finally:
+        if server_proc:
+            # Ask politely, but only briefly - the validator has its
+            # answer, so escalate to kill instead of waiting out a slow
+            # shutdown
+            server_proc.terminate()
+            try:
+                server_proc.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                server_proc.kill()
+                server_proc.wait(timeout=1)
+
+
 def main():
+    ap = argparse.ArgumentParser(description="Helix submission validator")
+    ap.add_argument(
+        "--skip-server", action="store_true",
+        help="skip the server startup test (saves a full model load "
+             "when iterating on docs or imports)"
+    )
+    args = ap.parse_args()
+
     print(f"\n{BOLD}{'='*60}")
     print("Helix Hackathon Submission Validator")
     print(f"{'='*60}{RESET}\n")
@@ -36,20 +112,18 @@ def main():
     passed = 0
     total = 0
     
-    # Test 1: Syntax validation
+    # Test 1: Syntax validation (in-process; no interpreter spawn and no
+    # hardcoded ven\ path)
     print(f"{BOLD}1. Syntax Validation{RESET}")
     total += 1
     try:
-        result = subprocess.run(
-            ["ven\\Scripts\\python.exe", "check_syntax.py"],
-            capture_output=True,
-            text=True,
-            timeout=10
-        )
-        if "✓ Syntax is valid!" in result.stdout:
+        from check_syntax import find_syntax_errors
+        errors = find_syntax_errors()
+        if not errors:
             passed += check("Python syntax valid", True)
         else:
-            check("Python syntax valid", False, result.stdout + result.stderr)
+            check("Python syntax valid", False,
+                  "; ".join(f"{p}: {m}" for p, m in errors))
     except Exception as e:
         check("Python syntax valid", False, str(e))
     
@@ -67,7 +141,7 @@ def main():
         total += 1
         try:
             result = subprocess.run(
-                ["ven\\Scripts\\python.exe", "-c", f"import {module}"],
+                [PY, "-c", f"import {module}"],
                 capture_output=True,
                 text=True,
                 timeout=10
@@ -79,38 +153,17 @@ def main():
         except Exception as e:
             check(f"Import {module}", False, str(e))
     
-    # Test 3: Server startup (brief test)
+    # Test 3: Server startup. By far the most expensive check (full
+    # model load), so --skip-server drops it entirely when iterating on
+    # docs or imports.
     print(f"\n{BOLD}3. Server Startup Test{RESET}")
-    total += 1
-    server_proc = None
-    try:
-        # Start server
-        server_proc = subprocess.Popen(
-            ["ven\\Scripts\\python.exe", "run.py"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-        
-        # Wait for startup (increased for model loading)
-        time.sleep(15)
-        
-        # Test ping endpoint (lightweight health check)
-        try:
-            response = requests.get("http://localhost:8000/ping", timeout=5)
-            if response.status_code == 200:
-                passed += check("Server starts and responds", True)
-            else:
-                check("Server starts and responds", False, f"HTTP {response.status_code}")
-        except requests.RequestException as e:
-            check("Server starts and responds", False, str(e))
-    except Exception as e:
-        check("Server starts and responds", False, str(e))
-    finally:
-        if server_proc:
-            server_proc.terminate()
-            server_proc.wait(timeout=5)
-    
+    if args.skip_server:
+        print("  (skipped via --skip-server)")
+    else:
+        total += 1
+        ok, details = _server_startup_ok()
+        passed += check("Server starts and responds", ok, details)
+
     # Test 4: Documentation completeness
     print(f"\n{BOLD}4. Documentation Files{RESET}")
     docs = [
@@ -122,16 +175,18 @@ def main():
     ]
     for doc in docs:
         total += 1
-        if os.path.exists(doc):
-            # Check file is not empty
-            with open(doc, 'r', encoding='utf-8') as f:
-                content = f.read()
-                if len(content) > 100:  # At least 100 chars
-                    passed += check(f"Documentation: {doc}", True)
-                else:
-                    check(f"Documentation: {doc}", False, "File too short")
-        else:
+        # One stat answers both existence and the size gate - the old
+        # path stat'ed, then read and decoded the whole doc just to
+        # take len() of it
+        try:
+            st = os.stat(doc)
+        except OSError:
             check(f"Documentation: {doc}", False, "File not found")
+            continue
+        if st.st_size > 100:  # At least 100 bytes of content
+            passed += check(f"Documentation: {doc}", True)
+        else:
+            check(f"Documentation: {doc}", False, "File too short")
     
     # Test 5: Benchmark scripts exist
     print(f"\n{BOLD}5. Benchmark Scripts{RESET}")
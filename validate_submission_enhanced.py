@@ -4,11 +4,16 @@ Helix Enhanced Validation Suite
 Target: 99%+ validation score
 """
 
+import argparse
+import importlib
 import subprocess
 import sys
 import os
 import time
 import re
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 
 # Color codes for terminal output
@@ -20,16 +25,45 @@ RESET = '\033[0m'
 BOLD = '\033[1m'
 
 
+class _CriticalAbort(Exception):
+    """Raised in fail-fast mode when a critical test fails."""
+
+
 class TestResult:
     """Track test results across categories"""
-    def __init__(self):
+
+    # Central criticality policy: tests whose failure alone sinks the
+    # submission. add_test consults this when the caller doesn't pass
+    # is_critical explicitly, so most call sites don't repeat the flag;
+    # an explicit value still wins for the few context-dependent cases
+    # (e.g. a missing code file is critical, an underweight one isn't).
+    CRITICAL = frozenset({
+        "Python syntax valid",
+        "Import src.model_loader", "Import src.inference",
+        "Import src.speculative", "Import src.kv_cache",
+        "Import src.batch_optimizer", "Import src.api",
+        "src/api.py valid", "src/inference.py valid",
+        "requirements.txt complete",
+        "src/api.py exists",
+    })
+
+    def __init__(self, fail_fast=False):
         self.total = 0
         self.passed = 0
         self.failed = 0
-        self.categories = {}
+        self.categories = defaultdict(lambda: {"passed": 0, "total": 0})
         self.critical_failures = []
-    
-    def add_test(self, category, name, passed, details="", is_critical=False):
+        # With fail_fast, the first critical failure aborts the run so
+        # the remaining ~40 tests don't re-scan already-broken sources.
+        # The suites are already ordered cheapest critical gates first.
+        self.fail_fast = fail_fast
+        # Per-suite output lines, emitted as one stdout write per suite
+        # instead of one syscall (plus Windows ANSI handling) per test
+        self._buf = []
+
+    def add_test(self, category, name, passed, details="", is_critical=None):
+        if is_critical is None:
+            is_critical = name in self.CRITICAL
         self.total += 1
         if passed:
             self.passed += 1
@@ -39,20 +73,28 @@ class TestResult:
             status = f"{RED}FAIL{RESET}"
             if is_critical:
                 self.critical_failures.append(name)
-        
-        if category not in self.categories:
-            self.categories[category] = {"passed": 0, "total": 0}
-        
+
         self.categories[category]["total"] += 1
         if passed:
             self.categories[category]["passed"] += 1
-        
-        print(f"  {status} {name}")
+
+        self._buf.append(f"  {status} {name}\n")
         if details and not passed:
-            print(f"    {YELLOW}{details}{RESET}")
-        
+            self._buf.append(f"    {YELLOW}{details}{RESET}\n")
+
+        if is_critical and not passed and self.fail_fast:
+            raise _CriticalAbort(name)
+
         return passed
-    
+
+    def suite_header(self, text):
+        self._buf.append(text + "\n")
+
+    def flush_suite(self):
+        if self._buf:
+            sys.stdout.write(''.join(self._buf))
+            self._buf.clear()
+
     def print_summary(self):
         print(f"\n{BOLD}{'='*60}")
         print("Test Summary by Category")
@@ -84,6 +126,103 @@ class TestResult:
             print(f"{RED}{BOLD}✗ NEEDS WORK - Multiple critical issues{RESET}")
 
 
+@lru_cache(maxsize=None)
+def _read_text(path):
+    """File contents, or None if missing/unreadable. One read per path
+    per run - several suites probe the same files (src/api.py alone is
+    scanned by three of them)."""
+    try:
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+# Every file the suites below read. Prefetched concurrently up front so
+# cold-cache disk latency overlaps instead of summing; the suites then
+# run against the warm in-memory cache on the main thread, which keeps
+# TestResult aggregation single-threaded.
+_ALL_FILES = [
+    "README.md", "ARCHITECTURE.md", "HACKATHON_SUBMISSION.md",
+    "CLI_DEMO.md", "IMPLEMENTATION_PROGRESS.md", "STUDY_GUIDE.md",
+    "IMPLEMENTATION_PLAN.md",
+    "src/__init__.py", "src/api.py", "src/inference.py",
+    "src/speculative.py", "src/kv_cache.py", "src/model_loader.py",
+    "src/batch_optimizer.py", "run.py",
+    "benchmark_speculative.py", "test_streaming.py", "validate_codebase.py",
+    "requirements.txt", ".gitignore",
+]
+
+
+# Required docs and the keywords that prove they have real content. One
+# IGNORECASE alternation per doc replaces M case-folded substring scans
+# (and the O(n) .lower() copy of each doc they needed).
+_REQUIRED_DOCS = {
+    "README.md": ["Quick Start", "python run.py"],
+    "ARCHITECTURE.md": ["PagedAttention", "trade-off"],
+    "HACKATHON_SUBMISSION.md": ["3x", "benchmark"],
+    "CLI_DEMO.md": ["curl", "/generate"],
+    "IMPLEMENTATION_PROGRESS.md": ["Phase"],
+    "STUDY_GUIDE.md": ["elevator pitch", "judge"],
+    "IMPLEMENTATION_PLAN.md": ["99%", "validation"]
+}
+_DOC_PATTERNS = {
+    doc: re.compile('|'.join(map(re.escape, kws)), re.IGNORECASE)
+    for doc, kws in _REQUIRED_DOCS.items()
+}
+
+
+@lru_cache(maxsize=None)
+def _dir_listing(path="."):
+    """{name: is_dir} for one directory via a single scandir pass.
+
+    The existence/is-dir probes below each cost a stat syscall; one scan
+    of the repo root answers all of them (DirEntry.is_dir reads the
+    dirent type on Linux, no extra stat)."""
+    try:
+        return {e.name: e.is_dir() for e in os.scandir(path)}
+    except OSError:
+        return {}
+
+
+def _exists(path):
+    head, sep, tail = path.partition("/")
+    if not sep:
+        return head in _dir_listing()
+    return bool(_dir_listing().get(head)) and tail in _dir_listing(head)
+
+
+def _exists_dir(name):
+    return _dir_listing().get(name, False)
+
+
+# The docstring/error-handling metrics over src/inference.py, fused so
+# one buffer traversal yields all four counts instead of four .count()
+# passes. Plain tokens, same substring semantics as the old counts.
+_QUALITY_RE = re.compile(r'"""|\'\'\'|try:|except')
+
+# Lines containing print( that aren't comment lines, anchored per line
+# so the C regex engine walks the buffer once - no .split('\n') list and
+# no per-line Python predicates
+_PRINT_RE = re.compile(r'(?m)^(?!\s*#).*?print\(')
+
+# Everything test_api_structure probes src/api.py for, matched in a
+# single alternation pass (each plain `in` check rescans the whole file)
+_API_TOKENS = [
+    'FastAPI(', '@app.post("/generate"', "'/generate'", '"/generate"',
+    '/generate/stream', 'StreamingResponse', '/health', '/metrics', '/batch',
+]
+_API_TOKEN_RE = re.compile(
+    '|'.join(re.escape(t) for t in sorted(_API_TOKENS, key=len, reverse=True))
+)
+
+
+def _prefetch_files():
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        # read() releases the GIL, so the reads genuinely overlap
+        list(ex.map(_read_text, _ALL_FILES))
+
+
 def run_command(cmd, timeout=10):
     """Helper to run subprocess commands"""
     try:
@@ -102,70 +241,64 @@ def run_command(cmd, timeout=10):
 
 def test_syntax_and_imports(results):
     """Test 1-7: Syntax validation and critical imports"""
-    print(f"\n{BOLD}1. Syntax & Imports (7 tests){RESET}")
+    results.suite_header(f"\n{BOLD}1. Syntax & Imports (7 tests){RESET}")
     
-    # Test 1: Python syntax
-    success, stdout, stderr = run_command(["ven\\Scripts\\python.exe", "check_syntax.py"])
+    # Test 1: Python syntax. ast.parse in-process - no interpreter spawn,
+    # and no dependence on a ven\ layout that reviewers may not have.
+    from check_syntax import find_syntax_errors
+    errors = find_syntax_errors()
     results.add_test(
-        "Syntax", 
+        "Syntax",
         "Python syntax valid",
-        "OK: Syntax is valid!" in stdout or success,
-        stderr,
-        is_critical=True
+        not errors,
+        "; ".join(f"{p}: {m}" for p, m in errors),
     )
     
-    # Test 2-7: Critical imports
+    # Test 2-7: Critical imports. Imported in-process rather than via a
+    # subprocess per module: each spawn was a cold interpreter start that
+    # re-imported torch/transformers from scratch, so six spawns paid the
+    # heavy-dependency import six times. One process pays it once, and
+    # src.* modules share the already-imported dependency tree.
     modules = [
         "src.model_loader", "src.inference", "src.speculative",
         "src.kv_cache", "src.batch_optimizer", "src.api"
     ]
     for module in modules:
-        success, _, stderr = run_command(["ven\\Scripts\\python.exe", "-c", f"import {module}"])
+        try:
+            importlib.import_module(module)
+            success, error = True, ""
+        except Exception as e:
+            success, error = False, str(e)
         results.add_test(
             "Imports",
             f"Import {module}",
             success,
-            stderr,
-            is_critical=True
+            error,
         )
 
 
 def test_documentation(results):
     """Test 8-14: Documentation completeness and quality"""
-    print(f"\n{BOLD}2. Documentation (7 tests){RESET}")
-    
-    required_docs = {
-        "README.md": ["Quick Start", "python run.py"],
-        "ARCHITECTURE.md": ["PagedAttention", "trade-off"],
-        "HACKATHON_SUBMISSION.md": ["3x", "benchmark"],
-        "CLI_DEMO.md": ["curl", "/generate"],
-        "IMPLEMENTATION_PROGRESS.md": ["Phase"],
-        "STUDY_GUIDE.md": ["elevator pitch", "judge"],
-        "IMPLEMENTATION_PLAN.md": ["99%", "validation"]
-    }
+    results.suite_header(f"\n{BOLD}2. Documentation (7 tests){RESET}")
     
-    for doc, keywords in required_docs.items():
-        if os.path.exists(doc):
-            try:
-                with open(doc, 'r', encoding='utf-8') as f:
-                    content = f.read().lower()
-                    has_content = len(content) > 100
-                    has_keywords = any(kw.lower() in content for kw in keywords)
-                    results.add_test(
-                        "Docs",
-                        f"{doc} complete",
-                        has_content and has_keywords,
-                        f"Missing keywords: {keywords}" if not has_keywords else ""
-                    )
-            except Exception as e:
-                results.add_test("Docs", f"{doc} complete", False, str(e))
+    for doc, keywords in _REQUIRED_DOCS.items():
+        content = _read_text(doc)
+        if content is not None:
+            has_content = len(content) > 100
+            has_keywords = bool(_DOC_PATTERNS[doc].search(content))
+            results.add_test(
+                "Docs",
+                f"{doc} complete",
+                has_content and has_keywords,
+                f"Missing keywords: {keywords}" if not has_keywords else ""
+            )
         else:
             results.add_test("Docs", f"{doc} complete", False, "File not found")
 
 
 def test_code_files(results):
     """Test 15-22: Core code files exist and valid"""
-    print(f"\n{BOLD}3. Code Files (8 tests){RESET}")
+    results.suite_header(f"\n{BOLD}3. Code Files (8 tests){RESET}")
     
     code_files = [
         "src/__init__.py",
@@ -179,29 +312,24 @@ def test_code_files(results):
     ]
     
     for file_path in code_files:
-        if os.path.exists(file_path):
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    # Check: File has content, no syntax errors (simple heuristic)
-                    has_content = len(content) > 50
-                    no_obvious_errors = 'SyntaxError' not in content
-                    results.add_test(
-                        "Code",
-                        f"{file_path} valid",
-                        has_content and no_obvious_errors,
-                        "Empty or contains errors" if not (has_content and no_obvious_errors) else "",
-                        is_critical=file_path in ["src/api.py", "src/inference.py"]
-                    )
-            except Exception as e:
-                results.add_test("Code", f"{file_path} valid", False, str(e), is_critical=True)
+        content = _read_text(file_path)
+        if content is not None:
+            # Check: File has content, no syntax errors (simple heuristic)
+            has_content = len(content) > 50
+            no_obvious_errors = 'SyntaxError' not in content
+            results.add_test(
+                "Code",
+                f"{file_path} valid",
+                has_content and no_obvious_errors,
+                "Empty or contains errors" if not (has_content and no_obvious_errors) else "",
+            )
         else:
             results.add_test("Code", f"{file_path} valid", False, "File not found", is_critical=True)
 
 
 def test_benchmark_scripts(results):
     """Test 23-25: Benchmark scripts present"""
-    print(f"\n{BOLD}4. Benchmark Scripts (3 tests){RESET}")
+    results.suite_header(f"\n{BOLD}4. Benchmark Scripts (3 tests){RESET}")
     
     scripts = [
         "benchmark_speculative.py",
@@ -210,91 +338,76 @@ def test_benchmark_scripts(results):
     ]
     
     for script in scripts:
-        exists = os.path.exists(script)
-        if exists:
-            try:
-                with open(script, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    has_main = '__main__' in content or 'def ' in content
-                    results.add_test(
-                        "Benchmarks",
-                        f"{script} present",
-                        has_main,
-                        "No executable code found" if not has_main else ""
-                    )
-            except Exception as e:
-                results.add_test("Benchmarks", f"{script} present", False, str(e))
+        content = _read_text(script)
+        if content is not None:
+            has_main = '__main__' in content or 'def ' in content
+            results.add_test(
+                "Benchmarks",
+                f"{script} present",
+                has_main,
+                "No executable code found" if not has_main else ""
+            )
         else:
             results.add_test("Benchmarks", f"{script} present", False, "File not found")
 
 
 def test_configuration(results):
     """Test 26-31: Configuration files"""
-    print(f"\n{BOLD}5. Configuration (6 tests){RESET}")
+    results.suite_header(f"\n{BOLD}5. Configuration (6 tests){RESET}")
     
     # Test 26: requirements.txt has critical dependencies
-    if os.path.exists("requirements.txt"):
-        try:
-            with open("requirements.txt", 'r') as f:
-                deps = f.read()
-                critical_deps = ["torch", "transformers", "fastapi", "uvicorn"]
-                missing = [dep for dep in critical_deps if dep not in deps]
-                results.add_test(
-                    "Config",
-                    "requirements.txt complete",
-                    len(missing) == 0,
-                    f"Missing: {missing}" if missing else "",
-                    is_critical=True
-                )
-        except Exception as e:
-            results.add_test("Config", "requirements.txt complete", False, str(e), is_critical=True)
+    deps = _read_text("requirements.txt")
+    if deps is not None:
+        critical_deps = ["torch", "transformers", "fastapi", "uvicorn"]
+        missing = [dep for dep in critical_deps if dep not in deps]
+        results.add_test(
+            "Config",
+            "requirements.txt complete",
+            len(missing) == 0,
+            f"Missing: {missing}" if missing else "",
+        )
     else:
-        results.add_test("Config", "requirements.txt complete", False, "File not found", is_critical=True)
+        results.add_test("Config", "requirements.txt complete", False, "File not found")
     
     # Test 27: .gitignore exists
     results.add_test(
         "Config",
         ".gitignore present",
-        os.path.exists(".gitignore"),
+        _exists(".gitignore"),
         "File not found"
     )
-    
+
     # Test 28: Virtual environment exists
     results.add_test(
         "Config",
         "Virtual environment (ven/) exists",
-        os.path.exists("ven") and os.path.isdir("ven"),
+        _exists_dir("ven"),
         "Directory not found"
     )
-    
+
     # Test 29: copilot-instructions.md exists
-    instructions_path = ".github/copilot-instructions.md"
     results.add_test(
         "Config",
         "Copilot instructions present",
-        os.path.exists(instructions_path),
+        _exists(".github/copilot-instructions.md"),
         "File not found"
     )
     
     # Test 30: run.py is executable logic
-    if os.path.exists("run.py"):
-        try:
-            with open("run.py", 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-                has_uvicorn = 'uvicorn' in content
-                results.add_test(
-                    "Config",
-                    "run.py has server logic",
-                    has_uvicorn,
-                    "No uvicorn import found" if not has_uvicorn else ""
-                )
-        except Exception as e:
-            results.add_test("Config", "run.py has server logic", False, str(e))
+    content = _read_text("run.py")
+    if content is not None:
+        has_uvicorn = 'uvicorn' in content
+        results.add_test(
+            "Config",
+            "run.py has server logic",
+            has_uvicorn,
+            "No uvicorn import found" if not has_uvicorn else ""
+        )
     else:
         results.add_test("Config", "run.py has server logic", False, "File not found")
     
     # Test 31: CHANGELOG.md or version tracking
-    has_changelog = os.path.exists("CHANGELOG.md") or os.path.exists("VERSION")
+    has_changelog = _exists("CHANGELOG.md") or _exists("VERSION")
     results.add_test(
         "Config",
         "Version tracking present",
@@ -305,235 +418,217 @@ def test_configuration(results):
 
 def test_code_quality(results):
     """Test 32-39: Code quality checks"""
-    print(f"\n{BOLD}6. Code Quality (8 tests){RESET}")
+    results.suite_header(f"\n{BOLD}6. Code Quality (8 tests){RESET}")
     
     # Test 32: No print() statements in critical files (should use logging)
     critical_files = ["src/inference.py", "src/speculative.py", "src/api.py"]
     for file_path in critical_files:
-        if os.path.exists(file_path):
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    # Allow print in comments or strings, but not as statements
-                    print_statements = [line for line in content.split('\n') 
-                                      if 'print(' in line and not line.strip().startswith('#')]
-                    results.add_test(
-                        "Quality",
-                        f"{file_path} uses logging",
-                        len(print_statements) == 0,
-                        f"Found {len(print_statements)} print() statements"
-                    )
-            except Exception as e:
-                results.add_test("Quality", f"{file_path} uses logging", False, str(e))
-    
+        content = _read_text(file_path)
+        if content is not None:
+            # Allow print in comments or strings, but not as statements
+            print_count = sum(1 for _ in _PRINT_RE.finditer(content))
+            results.add_test(
+                "Quality",
+                f"{file_path} uses logging",
+                print_count == 0,
+                f"Found {print_count} print() statements"
+            )
+
     # Test 35: Functions have docstrings
-    if os.path.exists("src/inference.py"):
-        try:
-            with open("src/inference.py", 'r', encoding='utf-8') as f:
-                content = f.read()
-                # Count docstrings (triple quotes)
-                docstring_count = content.count('"""') + content.count("'''")
-                # Should have at least 10 functions with docstrings
-                results.add_test(
-                    "Quality",
-                    "Functions have docstrings",
-                    docstring_count >= 20,  # 10 functions = 20 triple-quotes
-                    f"Found {docstring_count//2} docstrings, expected ≥10"
-                )
-        except Exception as e:
-            results.add_test("Quality", "Functions have docstrings", False, str(e))
-    
-    # Test 36: Error handling present
-    if os.path.exists("src/inference.py"):
-        try:
-            with open("src/inference.py", 'r', encoding='utf-8') as f:
-                content = f.read()
-                try_count = content.count('try:')
-                except_count = content.count('except')
-                results.add_test(
-                    "Quality",
-                    "Error handling present",
-                    try_count >= 3 and except_count >= 3,
-                    f"Found {try_count} try blocks, {except_count} except blocks"
-                )
-        except Exception as e:
-            results.add_test("Quality", "Error handling present", False, str(e))
-    
+    content = _read_text("src/inference.py")
+    if content is not None:
+        counts = Counter(m.group(0) for m in _QUALITY_RE.finditer(content))
+        # Count docstrings (triple quotes)
+        docstring_count = counts['"""'] + counts["'''"]
+        # Should have at least 10 functions with docstrings
+        results.add_test(
+            "Quality",
+            "Functions have docstrings",
+            docstring_count >= 20,  # 10 functions = 20 triple-quotes
+            f"Found {docstring_count//2} docstrings, expected ≥10"
+        )
+
+        # Test 36: Error handling present (same file, same fused counts)
+        try_count = counts['try:']
+        except_count = counts['except']
+        results.add_test(
+            "Quality",
+            "Error handling present",
+            try_count >= 3 and except_count >= 3,
+            f"Found {try_count} try blocks, {except_count} except blocks"
+        )
+
     # Test 37: Type hints used
-    if os.path.exists("src/api.py"):
-        try:
-            with open("src/api.py", 'r', encoding='utf-8') as f:
-                content = f.read()
-                # Check for type hints
-                has_typing_import = 'from typing import' in content or 'import typing' in content
-                has_pydantic = 'from pydantic import BaseModel' in content
-                has_annotations = ' -> ' in content or ': str' in content or ': int' in content
-                results.add_test(
-                    "Quality",
-                    "Type hints used",
-                    has_typing_import or has_pydantic,  # Pydantic provides type validation
-                    "Missing type hints" if not (has_typing_import or has_pydantic) else ""
-                )
-        except Exception as e:
-            results.add_test("Quality", "Type hints used", False, str(e))
-    
-    # Test 38: Logging configured
-    files_with_logging = ["src/api.py", "src/inference.py", "run.py"]
-    for file_path in files_with_logging:
-        if os.path.exists(file_path):
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    has_logging = 'import logging' in content and 'logger' in content
-                    # Only test one file to avoid redundancy
-                    if file_path == "src/api.py":
-                        results.add_test(
-                            "Quality",
-                            "Logging configured",
-                            has_logging,
-                            "No logging setup found"
-                        )
-                    break
-            except Exception as e:
-                results.add_test("Quality", "Logging configured", False, str(e))
-                break
+    content = _read_text("src/api.py")
+    if content is not None:
+        # Check for type hints
+        has_typing_import = 'from typing import' in content or 'import typing' in content
+        has_pydantic = 'from pydantic import BaseModel' in content
+        has_annotations = ' -> ' in content or ': str' in content or ': int' in content
+        results.add_test(
+            "Quality",
+            "Type hints used",
+            has_typing_import or has_pydantic,  # Pydantic provides type validation
+            "Missing type hints" if not (has_typing_import or has_pydantic) else ""
+        )
+
+        # Test 38: Logging configured (only src/api.py is checked to
+        # avoid redundancy, and its content is already in hand)
+        has_logging = 'import logging' in content and 'logger' in content
+        results.add_test(
+            "Quality",
+            "Logging configured",
+            has_logging,
+            "No logging setup found"
+        )
 
 
 def test_api_structure(results):
     """Test 40-45: API structure and endpoints"""
-    print(f"\n{BOLD}7. API Structure (6 tests){RESET}")
-    
-    if os.path.exists("src/api.py"):
-        try:
-            with open("src/api.py", 'r', encoding='utf-8') as f:
-                content = f.read()
-                
-                # Test 40: FastAPI app defined
-                results.add_test(
-                    "API",
-                    "FastAPI app defined",
-                    'FastAPI(' in content,
-                    "No FastAPI instance found"
-                )
-                
-                # Test 41: /generate endpoint
-                results.add_test(
-                    "API",
-                    "/generate endpoint exists",
-                    '@app.post("/generate"' in content or "'/generate'" in content or '"/generate"' in content,
-                    "Endpoint not found"
-                )
-                
-                # Test 42: /health endpoint
-                results.add_test(
-                    "API",
-                    "/health endpoint exists",
-                    '/health' in content,
-                    "Endpoint not found"
-                )
-                
-                # Test 43: /metrics endpoint
-                results.add_test(
-                    "API",
-                    "/metrics endpoint exists",
-                    '/metrics' in content,
-                    "Endpoint not found"
-                )
-                
-                # Test 44: /generate/stream endpoint (SSE)
-                results.add_test(
-                    "API",
-                    "/generate/stream endpoint exists",
-                    '/generate/stream' in content and 'StreamingResponse' in content,
-                    "SSE endpoint not found"
-                )
-                
-                # Test 45: /generate/batch endpoint
-                results.add_test(
-                    "API",
-                    "/generate/batch endpoint exists",
-                    '/batch' in content,
-                    "Batch endpoint not found"
-                )
-        except Exception as e:
-            # Mark all API tests as failed
-            for test_name in ["FastAPI app defined", "/generate endpoint", "/health endpoint",
-                            "/metrics endpoint", "/stream endpoint", "/batch endpoint"]:
-                results.add_test("API", test_name, False, str(e))
+    results.suite_header(f"\n{BOLD}7. API Structure (6 tests){RESET}")
+
+    content = _read_text("src/api.py")
+    if content is not None:
+        # One pass over src/api.py instead of a full-buffer scan per
+        # token. Longest alternative first so '@app.post("/generate"'
+        # and '/generate/stream' win over their shorter prefixes; tokens
+        # swallowed by a longer match are back-filled below.
+        seen = {m.group(0) for m in _API_TOKEN_RE.finditer(content)}
+        for tok in _API_TOKENS:
+            if tok not in seen and any(tok in s for s in seen):
+                seen.add(tok)
+
+        # Test 40: FastAPI app defined
+        results.add_test(
+            "API",
+            "FastAPI app defined",
+            'FastAPI(' in seen,
+            "No FastAPI instance found"
+        )
+
+        # Test 41: /generate endpoint
+        results.add_test(
+            "API",
+            "/generate endpoint exists",
+            '@app.post("/generate"' in seen or "'/generate'" in seen or '"/generate"' in seen,
+            "Endpoint not found"
+        )
+
+        # Test 42: /health endpoint
+        results.add_test(
+            "API",
+            "/health endpoint exists",
+            '/health' in seen,
+            "Endpoint not found"
+        )
+
+        # Test 43: /metrics endpoint
+        results.add_test(
+            "API",
+            "/metrics endpoint exists",
+            '/metrics' in seen,
+            "Endpoint not found"
+        )
+
+        # Test 44: /generate/stream endpoint (SSE)
+        results.add_test(
+            "API",
+            "/generate/stream endpoint exists",
+            '/generate/stream' in seen and 'StreamingResponse' in seen,
+            "SSE endpoint not found"
+        )
+
+        # Test 45: /generate/batch endpoint
+        results.add_test(
+            "API",
+            "/generate/batch endpoint exists",
+            '/batch' in seen,
+            "Batch endpoint not found"
+        )
     else:
-        results.add_test("API", "src/api.py exists", False, "File not found", is_critical=True)
+        results.add_test("API", "src/api.py exists", False, "File not found")
 
 
 def test_submission_readiness(results):
     """Test 46-48: Final submission checks"""
-    print(f"\n{BOLD}8. Submission Readiness (3 tests){RESET}")
+    results.suite_header(f"\n{BOLD}8. Submission Readiness (3 tests){RESET}")
     
     # Test 46: Git repository initialized
     results.add_test(
         "Submission",
         "Git repository initialized",
-        os.path.exists(".git") and os.path.isdir(".git"),
+        _exists_dir(".git"),
         "Not a git repository"
     )
     
     # Test 47: Check for large files that shouldn't be committed
-    large_files_ok = True
-    if os.path.exists(".gitignore"):
-        try:
-            with open(".gitignore", 'r') as f:
-                gitignore = f.read()
-                # Should ignore common large directories
-                patterns = ["ven/", "__pycache__", "*.pyc", "*.log"]
-                missing_patterns = [p for p in patterns if p not in gitignore]
-                results.add_test(
-                    "Submission",
-                    ".gitignore properly configured",
-                    len(missing_patterns) == 0,
-                    f"Consider adding: {missing_patterns}" if missing_patterns else ""
-                )
-        except Exception as e:
-            results.add_test("Submission", ".gitignore properly configured", False, str(e))
-    
+    gitignore = _read_text(".gitignore")
+    if gitignore is not None:
+        # Should ignore common large directories
+        patterns = ["ven/", "__pycache__", "*.pyc", "*.log"]
+        missing_patterns = [p for p in patterns if p not in gitignore]
+        results.add_test(
+            "Submission",
+            ".gitignore properly configured",
+            len(missing_patterns) == 0,
+            f"Consider adding: {missing_patterns}" if missing_patterns else ""
+        )
+
     # Test 48: README has project description
-    if os.path.exists("README.md"):
-        try:
-            with open("README.md", 'r', encoding='utf-8') as f:
-                readme = f.read()
-                has_title = len(readme) > 500  # Substantial README
-                has_helix = 'helix' in readme.lower()
-                results.add_test(
-                    "Submission",
-                    "README complete",
-                    has_title and has_helix,
-                    "README needs more content" if not has_title else ""
-                )
-        except Exception as e:
-            results.add_test("Submission", "README complete", False, str(e))
+    readme = _read_text("README.md")
+    if readme is not None:
+        has_title = len(readme) > 500  # Substantial README
+        has_helix = 'helix' in readme.lower()
+        results.add_test(
+            "Submission",
+            "README complete",
+            has_title and has_helix,
+            "README needs more content" if not has_title else ""
+        )
     else:
         results.add_test("Submission", "README complete", False, "File not found", is_critical=True)
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Helix enhanced validation")
+    parser.add_argument(
+        "--fail-fast", action="store_true",
+        help="abort on the first critical failure instead of running all 48 tests"
+    )
+    args = parser.parse_args()
+
     print(f"\n{BOLD}{'='*60}")
     print("Helix Enhanced Validation (48 Tests)")
     print("Target: 99%+ for Top 1% Submission")
     print(f"{'='*60}{RESET}")
-    
-    results = TestResult()
-    
-    # Run all test suites
-    test_syntax_and_imports(results)
-    test_documentation(results)
-    test_code_files(results)
-    test_benchmark_scripts(results)
-    test_configuration(results)
-    test_code_quality(results)
-    test_api_structure(results)
-    test_submission_readiness(results)
-    
+
+    results = TestResult(fail_fast=args.fail_fast)
+
+    # Warm the content cache with all file reads overlapped
+    _prefetch_files()
+
+    # Run all test suites, one buffered stdout write per suite
+    suites = [
+        test_syntax_and_imports,
+        test_documentation,
+        test_code_files,
+        test_benchmark_scripts,
+        test_configuration,
+        test_code_quality,
+        test_api_structure,
+        test_submission_readiness,
+    ]
+    try:
+        for suite in suites:
+            suite(results)
+            results.flush_suite()
+    except _CriticalAbort as abort:
+        results.flush_suite()
+        print(f"\n{RED}{BOLD}Aborting (--fail-fast): critical failure in '{abort}'{RESET}")
+
     # Print comprehensive summary
     results.print_summary()
-    
+
     # Return success if ≥99%
     return results.passed / results.total >= 0.99
 